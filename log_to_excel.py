@@ -9,17 +9,40 @@ Usage example:
 from __future__ import annotations
 
 import argparse
+import bisect
 import difflib
+import hashlib
+import io
+import os
+import re
+import sys
 import xml.etree.ElementTree as ET
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
 
 try:
-    from .xlsx_writer import CellValue, SheetData, write_xlsx
+    from .xlsx_writer import (
+        CellValue,
+        ColumnData,
+        RawSheetData,
+        SheetData,
+        column_index,
+        columns_from_rows,
+        write_xlsx,
+    )
 except ImportError:
-    from xlsx_writer import CellValue, SheetData, write_xlsx
+    from xlsx_writer import (
+        CellValue,
+        ColumnData,
+        RawSheetData,
+        SheetData,
+        column_index,
+        columns_from_rows,
+        write_xlsx,
+    )
 
 
 @dataclass
@@ -63,18 +86,156 @@ def _discover_pairs(input_dir: Path) -> List[LogPair]:
 
 
 def _read_log_lines(path: Path) -> List[str]:
-    with path.open("r", encoding="utf-8") as fh:
-        return [line.rstrip("\r\n") for line in fh]
+    return _decode_log_lines(path.read_bytes())
+
+
+def _decode_log_lines(data: bytes) -> List[str]:
+    # Decode once and split in C; newline handling matches text-mode reading.
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    # Interned lines let the matcher's dict probes compare by identity.
+    return list(map(sys.intern, lines))
+
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _unique_positions(lines: List[str], lo: int, hi: int) -> Dict[str, int]:
+    """Map each line in lines[lo:hi] to its index, or -1 if it occurs more than once."""
+    positions: Dict[str, int] = {}
+    for index in range(lo, hi):
+        line = lines[index]
+        positions[line] = -1 if line in positions else index
+    return positions
+
+
+def _unique_anchors(
+    stg_lines: List[str],
+    prd_lines: List[str],
+    s_lo: int,
+    s_hi: int,
+    p_lo: int,
+    p_hi: int,
+) -> List[Tuple[int, int]]:
+    """Return the longest increasing run of lines unique to both ranges (patience sort)."""
+    stg_positions = _unique_positions(stg_lines, s_lo, s_hi)
+    prd_positions = _unique_positions(prd_lines, p_lo, p_hi)
+    # Dicts keep first-insertion order, so candidates come out sorted by STG index.
+    candidates = [
+        (i, prd_positions[line])
+        for line, i in stg_positions.items()
+        if i >= 0 and prd_positions.get(line, -1) >= 0
+    ]
+    if not candidates:
+        return []
+
+    pile_tops: List[int] = []
+    pile_heads: List[int] = []
+    backrefs: List[int] = []
+    for position, (_, j) in enumerate(candidates):
+        pile = bisect.bisect_left(pile_tops, j)
+        backrefs.append(pile_heads[pile - 1] if pile else -1)
+        if pile == len(pile_tops):
+            pile_tops.append(j)
+            pile_heads.append(position)
+        else:
+            pile_tops[pile] = j
+            pile_heads[pile] = position
+
+    anchors: List[Tuple[int, int]] = []
+    position = pile_heads[-1]
+    while position != -1:
+        anchors.append(candidates[position])
+        position = backrefs[position]
+    anchors.reverse()
+    return anchors
+
+
+def _diff_opcodes(stg_lines: List[str], prd_lines: List[str]) -> List[Opcode]:
+    """Return SequenceMatcher-style opcodes computed with a patience diff.
+
+    Each range has its common prefix/suffix stripped, is split on lines that occur
+    exactly once on both sides, and the gaps between those anchors are diffed the
+    same way.  Gaps without anchors fall back to ``difflib.SequenceMatcher``.
+    """
+    opcodes: List[Opcode] = []
+    # Work items are popped from the end, so pushes happen in reverse order.
+    pending: List[Tuple[bool, Opcode]] = [
+        (False, ("", 0, len(stg_lines), 0, len(prd_lines)))
+    ]
+    while pending:
+        is_opcode, item = pending.pop()
+        if is_opcode:
+            opcodes.append(item)
+            continue
+
+        _, s_lo, s_hi, p_lo, p_hi = item
+        start_s, start_p = s_lo, p_lo
+        while s_lo < s_hi and p_lo < p_hi and stg_lines[s_lo] == prd_lines[p_lo]:
+            s_lo += 1
+            p_lo += 1
+        end_s, end_p = s_hi, p_hi
+        while s_lo < s_hi and p_lo < p_hi and stg_lines[s_hi - 1] == prd_lines[p_hi - 1]:
+            s_hi -= 1
+            p_hi -= 1
+
+        if s_hi < end_s:
+            pending.append((True, ("equal", s_hi, end_s, p_hi, end_p)))
+        if s_lo == s_hi:
+            if p_lo < p_hi:
+                pending.append((True, ("insert", s_lo, s_hi, p_lo, p_hi)))
+        elif p_lo == p_hi:
+            pending.append((True, ("delete", s_lo, s_hi, p_lo, p_hi)))
+        else:
+            anchors = _unique_anchors(stg_lines, prd_lines, s_lo, s_hi, p_lo, p_hi)
+            if anchors:
+                prev_s, prev_p = s_hi, p_hi
+                for anchor_s, anchor_p in reversed(anchors):
+                    pending.append((False, ("", anchor_s + 1, prev_s, anchor_p + 1, prev_p)))
+                    pending.append((True, ("equal", anchor_s, anchor_s + 1, anchor_p, anchor_p + 1)))
+                    prev_s, prev_p = anchor_s, anchor_p
+                pending.append((False, ("", s_lo, prev_s, p_lo, prev_p)))
+            else:
+                matcher = difflib.SequenceMatcher(
+                    a=stg_lines[s_lo:s_hi], b=prd_lines[p_lo:p_hi], autojunk=False
+                )
+                for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+                    pending.append(
+                        (True, (tag, i1 + s_lo, i2 + s_lo, j1 + p_lo, j2 + p_lo))
+                    )
+        if s_lo > start_s:
+            pending.append((True, ("equal", start_s, s_lo, start_p, p_lo)))
+    return opcodes
 
 
 def _align_logs(
     stg_lines: List[str], prd_lines: List[str]
 ) -> List[Tuple[str, str, int | None, int | None]]:
-    """Align two sequences of log lines using difflib.SequenceMatcher."""
-    matcher = difflib.SequenceMatcher(a=stg_lines, b=prd_lines, autojunk=False)
-    aligned: List[Tuple[str, str, int | None, int | None]] = []
+    """Align two sequences of log lines using a patience diff (see ``_diff_opcodes``).
+
+    Regression checks (``python -m doctest log_to_excel.py``).  Long repetitive
+    gaps must still align line by line:
+
+    >>> stg = ["----", "status ok", "heartbeat"] * 2500
+    >>> prd = stg[:10] + ["inserted"] + stg[10:7399] + stg[7400:]
+    >>> aligned = _align_logs(stg, prd)
+    >>> len(aligned), sum(1 for stg_line, prd_line, *_ in aligned if stg_line != prd_line)
+    (7501, 2)
 
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+    Blank separator lines must pair up like any other line:
+
+    >>> aligned = _align_logs(["y", "x", "", "y", ""], ["x", "x", "", "x"])
+    >>> sum(1 for stg_line, prd_line, *_ in aligned if stg_line != prd_line)
+    2
+    """
+    opcodes = _diff_opcodes(stg_lines, prd_lines)
+
+    aligned: List[Tuple[str, str, int | None, int | None]] = []
+    for tag, i1, i2, j1, j2 in opcodes:
         if tag == "equal":
             for offset, (s_idx, p_idx) in enumerate(zip(range(i1, i2), range(j1, j2))):
                 aligned.append(
@@ -150,35 +311,106 @@ def _build_header_rows(pair: LogPair) -> List[List[CellValue]]:
     ]
 
 
-def _build_rows_for_pair(pair: LogPair) -> List[List[CellValue]]:
-    stg_lines = _read_log_lines(pair.stg_path)
-    prd_lines = _read_log_lines(pair.prd_path)
-    aligned = _align_logs(stg_lines, prd_lines)
-
-    rows: List[List[CellValue]] = _build_header_rows(pair)
-    current_row = len(rows) + 1
-
-    for stg_line, prd_line, *_unused_indices in aligned:
-        match_flag = "1" if stg_line == prd_line else "0"
-        note = "" if match_flag == "1" else "差異あり"
-        rows.append(
-            [
-                CellValue(),
-                CellValue(value=stg_line),
-                CellValue(
-                    value=match_flag,
-                    formula=f"B{current_row}=D{current_row}",
-                    data_type="b",
-                ),
-                CellValue(value=prd_line),
-                CellValue(value=note),
-            ]
-        )
-        current_row += 1
-    return rows
+def _align_pair(
+    stg_data: bytes, prd_data: bytes
+) -> List[Tuple[str, str, int | None, int | None]]:
+    """Decode and align the contents of one STG/PRD pair; runs in worker processes."""
+    stg_lines = _decode_log_lines(stg_data)
+    prd_lines = _decode_log_lines(prd_data)
+    if stg_lines == prd_lines:
+        return [
+            (line, line, index, index)
+            for index, line in enumerate(stg_lines, start=1)
+        ]
+    return _align_logs(stg_lines, prd_lines)
+
+
+def _align_pairs(
+    pairs: List[LogPair],
+) -> List[List[Tuple[str, str, int | None, int | None]]]:
+    """Align every pair, diffing each distinct STG/PRD content combination once.
+
+    Hosts often share a baseline log, so pairs are grouped by the SHA-256 digests of
+    their file contents.  Each file is read once here and only the contents of the
+    distinct combinations are handed to the process pool, since the alignments are
+    CPU-bound and independent.
+    """
+    keys: List[Tuple[bytes, bytes]] = []
+    unique_data: Dict[Tuple[bytes, bytes], Tuple[bytes, bytes]] = {}
+    for pair in pairs:
+        stg_data = pair.stg_path.read_bytes()
+        prd_data = pair.prd_path.read_bytes()
+        key = (hashlib.sha256(stg_data).digest(), hashlib.sha256(prd_data).digest())
+        keys.append(key)
+        unique_data.setdefault(key, (stg_data, prd_data))
+
+    stg_blobs = [stg_data for stg_data, _ in unique_data.values()]
+    prd_blobs = [prd_data for _, prd_data in unique_data.values()]
+    if len(unique_data) > 1:
+        workers = min(len(unique_data), os.cpu_count() or 1)
+        if sys.platform == "win32":
+            # ProcessPoolExecutor rejects more than 61 workers on Windows.
+            workers = min(workers, 61)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_align_pair, stg_blobs, prd_blobs))
+    else:
+        results = list(map(_align_pair, stg_blobs, prd_blobs))
+    alignments = dict(zip(unique_data, results))
+    return [alignments[key] for key in keys]
+
+
+def _build_rows_for_pair(
+    pair: LogPair, aligned: List[Tuple[str, str, int | None, int | None]]
+) -> List[ColumnData]:
+    header_rows = _build_header_rows(pair)
+    columns = columns_from_rows(header_rows)
+    _append_diff_rows(columns, aligned, len(header_rows) + 1)
+    return columns
+
+
+def _append_diff_rows(
+    columns: List[ColumnData],
+    aligned: List[Tuple[str, str, int | None, int | None]],
+    start_row: int,
+) -> None:
+    """Append aligned line pairs to the A-E columns, starting at sheet row start_row."""
+    count = len(aligned)
+    stg_values = [entry[0] for entry in aligned]
+    prd_values = [entry[1] for entry in aligned]
+    matched = [stg_line == prd_line for stg_line, prd_line in zip(stg_values, prd_values)]
+    blank_col, stg_col, flag_col, prd_col, note_col = columns
+
+    blank_col.extend_blank(count)
+
+    stg_col.values.extend(stg_values)
+    stg_col.formulas.extend([None] * count)
+    stg_col.types.extend([None] * count)
+
+    flag_col.values.extend(["1" if flag else "0" for flag in matched])
+    flag_col.formulas.extend(
+        [f"B{row}=D{row}" for row in range(start_row, start_row + count)]
+    )
+    flag_col.types.extend(["b"] * count)
+
+    prd_col.values.extend(prd_values)
+    prd_col.formulas.extend([None] * count)
+    prd_col.types.extend([None] * count)
+
+    note_col.values.extend(["" if flag else "差異あり" for flag in matched])
+    note_col.formulas.extend([None] * count)
+    note_col.types.extend([None] * count)
+
+
+_COL_RE = re.compile(r"[A-Z]+")
 
 
 def _column_index_from_ref(cell_ref: str) -> int:
+    match = _COL_RE.match(cell_ref)
+    if match is not None:
+        index = column_index(match.group())
+        if index is not None:
+            return index
+    # Unusual references (lower case, out of range) use the generic conversion.
     letters = "".join(ch for ch in cell_ref if ch.isalpha())
     index = 0
     for char in letters.upper():
@@ -189,20 +421,36 @@ def _column_index_from_ref(cell_ref: str) -> int:
 def _load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
     if "xl/sharedStrings.xml" not in zf.namelist():
         return []
-    root = ET.fromstring(zf.read("xl/sharedStrings.xml"))
     ns = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    si_tag = "{%s}si" % ns["s"]
+    t_tag = "{%s}t" % ns["s"]
     strings: List[str] = []
-    for si in root.findall("s:si", ns):
-        text = "".join(t.text or "" for t in si.findall(".//s:t", ns))
-        strings.append(text)
+    with zf.open("xl/sharedStrings.xml") as fh:
+        events = ET.iterparse(fh, events=("start", "end"))
+        _, root = next(events)
+        for event, elem in events:
+            if event != "end" or elem.tag != si_tag:
+                continue
+            strings.append("".join(t.text or "" for t in elem.iter(t_tag)))
+            # Only the <sst> root can hold <si>; drop each one once read.
+            root.remove(elem)
     return strings
 
 
 def _parse_sheet_rows(xml_bytes: bytes, shared_strings: List[str]) -> List[List[CellValue]]:
     ns = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
-    root = ET.fromstring(xml_bytes)
+    sheet_data_tag = "{%s}sheetData" % ns["s"]
+    row_tag = "{%s}row" % ns["s"]
     rows: List[List[CellValue]] = []
-    for row in root.findall("s:sheetData/s:row", ns):
+    sheet_data = None
+    # Stream the rows and drop each one once parsed so memory stays flat.
+    for event, row in ET.iterparse(io.BytesIO(xml_bytes), events=("start", "end")):
+        if event == "start":
+            if row.tag == sheet_data_tag:
+                sheet_data = row
+            continue
+        if row.tag != row_tag:
+            continue
         cells: Dict[int, CellValue] = {}
         max_col = 0
         for cell in row.findall("s:c", ns):
@@ -225,6 +473,8 @@ def _parse_sheet_rows(xml_bytes: bytes, shared_strings: List[str]) -> List[List[
                 text = value_node.text or ""
             cells[col_index] = CellValue(value=text, formula=formula, data_type=data_type)
             max_col = max(max_col, col_index)
+        if sheet_data is not None:
+            sheet_data.remove(row)
         if max_col == 0:
             rows.append([])
             continue
@@ -235,14 +485,30 @@ def _parse_sheet_rows(xml_bytes: bytes, shared_strings: List[str]) -> List[List[
     return rows
 
 
-def _load_existing_sheets(output_path: Path) -> List[SheetData]:
+@dataclass
+class ExistingWorkbook:
+    """Parts of a previously generated workbook that are carried into the new one."""
+    sheets: List[SheetData | RawSheetData]
+    shared_strings: List[str]
+    styles_xml: bytes | None
+
+
+def _load_existing_workbook(output_path: Path) -> ExistingWorkbook:
+    """Collect the sheets of output_path so they can be written back unchanged.
+
+    Sheet XML is copied byte-for-byte together with the shared strings it indexes.
+    Sheets with their own relationships (drawings, comments, ...) cannot be copied
+    without those parts, so they are parsed into cells instead.
+    """
     ns = {
         "w": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
         "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
     }
-    sheets: List[SheetData] = []
+    sheets: List[SheetData | RawSheetData] = []
     with zipfile.ZipFile(output_path) as zf:
+        part_names = set(zf.namelist())
         shared_strings = _load_shared_strings(zf)
+        styles_xml = zf.read("xl/styles.xml") if "xl/styles.xml" in part_names else None
         wb_root = ET.fromstring(zf.read("xl/workbook.xml"))
         rel_root = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
         rel_map = {
@@ -257,9 +523,15 @@ def _load_existing_sheets(output_path: Path) -> List[SheetData]:
             target = rel_map.get(rid)
             if not target:
                 continue
-            rows = _parse_sheet_rows(zf.read(f"xl/{target}"), shared_strings)
-            sheets.append(SheetData(name=name, rows=rows))
-    return sheets
+            part_name = f"xl/{target}"
+            folder, _, file_name = part_name.rpartition("/")
+            xml_bytes = zf.read(part_name)
+            if f"{folder}/_rels/{file_name}.rels" in part_names:
+                rows = _parse_sheet_rows(xml_bytes, shared_strings)
+                sheets.append(SheetData.from_rows(name, rows))
+            else:
+                sheets.append(RawSheetData(name=name, xml_bytes=xml_bytes))
+    return ExistingWorkbook(sheets, shared_strings, styles_xml)
 
 
 def _make_unique_sheet_name(base_name: str, used_names: Set[str]) -> str:
@@ -285,20 +557,25 @@ def generate_workbook(input_dir: Path, output_path: Path) -> None:
             f"No STG/PRD log pairs were discovered under '{input_dir}'."
         )
 
-    existing_sheets: List[SheetData] = []
+    existing = ExistingWorkbook(sheets=[], shared_strings=[], styles_xml=None)
     used_names: Set[str] = set()
     if output_path.exists():
-        existing_sheets = _load_existing_sheets(output_path)
-        used_names.update(sheet.name for sheet in existing_sheets)
+        existing = _load_existing_workbook(output_path)
+        used_names.update(sheet.name for sheet in existing.sheets)
 
     new_sheets: List[SheetData] = []
-    for pair in pairs:
-        rows = _build_rows_for_pair(pair)
+    for pair, aligned in zip(pairs, _align_pairs(pairs)):
+        columns = _build_rows_for_pair(pair, aligned)
         base_name = pair.base_name[:31]
         sheet_name = _make_unique_sheet_name(base_name, used_names)
-        new_sheets.append(SheetData(name=sheet_name, rows=rows))
+        new_sheets.append(SheetData(name=sheet_name, columns=columns))
 
-    write_xlsx(str(output_path), existing_sheets + new_sheets)
+    write_xlsx(
+        str(output_path),
+        existing.sheets + new_sheets,
+        shared_strings=existing.shared_strings,
+        styles_xml=existing.styles_xml,
+    )
 
 
 def parse_args() -> argparse.Namespace:
@@ -8,6 +8,7 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 from typing import Dict, List, Set
+import io
 import xml.etree.ElementTree as ET
 import zipfile
 
@@ -16,7 +17,7 @@ if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
 # pylint: disable=wrong-import-position
-from log_to_excel import _discover_pairs, _read_log_lines  # type: ignore
+from log_to_excel import _discover_pairs, _load_shared_strings, _read_log_lines  # type: ignore
 # pylint: enable=wrong-import-position
 
 
@@ -40,14 +41,33 @@ def _load_sheet_texts(xlsx_path: Path) -> Dict[str, List[str]]:
             for rel in rels_root.findall("{http://schemas.openxmlformats.org/package/2006/relationships}Relationship")
         }
 
+        shared_strings = _load_shared_strings(zf)
         sheet_texts: Dict[str, List[str]] = {}
         for rid, name in sheets:
             sheet_target = rels[rid]
-            sheet_xml = ET.fromstring(zf.read(f"xl/{sheet_target}"))
-            ns_sheet = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+            main_ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
             texts: List[str] = []
-            for t in sheet_xml.findall(".//s:t", ns_sheet):
-                texts.append(t.text or "")
+            sheet_data = None
+            for event, elem in ET.iterparse(
+                io.BytesIO(zf.read(f"xl/{sheet_target}")), events=("start", "end")
+            ):
+                if event == "start":
+                    if elem.tag == f"{{{main_ns}}}sheetData":
+                        sheet_data = elem
+                    continue
+                if elem.tag != f"{{{main_ns}}}row":
+                    continue
+                for cell in elem.iter(f"{{{main_ns}}}c"):
+                    value_node = cell.find(f"{{{main_ns}}}v")
+                    if cell.get("t") == "s" and value_node is not None:
+                        idx = int(value_node.text or "0")
+                        if 0 <= idx < len(shared_strings):
+                            texts.append(shared_strings[idx])
+                        continue
+                    for t in cell.iter(f"{{{main_ns}}}t"):
+                        texts.append(t.text or "")
+                if sheet_data is not None:
+                    sheet_data.remove(elem)
             sheet_texts[name] = texts
 
     return sheet_texts
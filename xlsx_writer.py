@@ -1,5 +1,5 @@
 """
-Minimal XLSX writer that creates worksheets using inline strings only.
+Minimal XLSX writer that stores cell text in a shared strings table.
 
 This module avoids third-party dependencies by building the required Open XML
 structures manually.  It supports basic text content without styling.
@@ -7,24 +7,106 @@ structures manually.  It supports basic text content without styling.
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable, List
-from xml.sax.saxutils import escape
+from dataclasses import dataclass, field
+from typing import IO, Dict, Iterable, List, Sequence
 import io
 import zipfile
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CellValue:
     value: str = ""
     formula: str | None = None
     data_type: str | None = None
 
 
+@dataclass
+class ColumnData:
+    """One worksheet column stored as parallel per-row lists."""
+    values: List[str] = field(default_factory=list)
+    formulas: List[str | None] = field(default_factory=list)
+    types: List[str | None] = field(default_factory=list)
+
+    def extend_blank(self, count: int) -> None:
+        self.values.extend([""] * count)
+        self.formulas.extend([None] * count)
+        self.types.extend([None] * count)
+
+
 @dataclass
 class SheetData:
     name: str
-    rows: List[List[CellValue]]
+    columns: List[ColumnData]
+
+    @property
+    def row_count(self) -> int:
+        return len(self.columns[0].values) if self.columns else 0
+
+    @classmethod
+    def from_rows(cls, name: str, rows: Iterable[Sequence[CellValue]]) -> SheetData:
+        return cls(name=name, columns=columns_from_rows(rows))
+
+
+def columns_from_rows(rows: Iterable[Sequence[CellValue]]) -> List[ColumnData]:
+    """Convert row-major cells into columns, padding short rows with blank cells."""
+    columns: List[ColumnData] = []
+    row_count = 0
+    for row in rows:
+        while len(columns) < len(row):
+            column = ColumnData()
+            column.extend_blank(row_count)
+            columns.append(column)
+        for col_index, column in enumerate(columns):
+            if col_index < len(row):
+                cell = row[col_index]
+                column.values.append(cell.value)
+                column.formulas.append(cell.formula)
+                column.types.append(cell.data_type)
+            else:
+                column.extend_blank(1)
+        row_count += 1
+    return columns
+
+
+@dataclass
+class RawSheetData:
+    """A worksheet whose XML is copied into the workbook unchanged.
+
+    Shared string indices in xml_bytes must refer to the ``shared_strings`` passed
+    to :func:`write_xlsx`.
+    """
+    name: str
+    xml_bytes: bytes
+
+
+class _SharedStringPool:
+    """Assign shared string indices in first-use order."""
+
+    def __init__(self, initial: Sequence[str] = ()) -> None:
+        # Seeded strings keep their positions even if the source table repeats one.
+        self.values: List[str] = list(initial)
+        self.indices: Dict[str, int] = {}
+        for idx, value in enumerate(self.values):
+            self.indices.setdefault(value, idx)
+
+    def index(self, value: str) -> int:
+        idx = self.indices.get(value)
+        if idx is None:
+            idx = self.indices[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+
+_XML_ESCAPE = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "\n": "&#10;",
+        "\r": "&#13;",
+    }
+)
 
 
 def _column_letter(index: int) -> str:
@@ -38,52 +120,107 @@ def _column_letter(index: int) -> str:
     return "".join(reversed(letters))
 
 
-def _build_sheet_xml(sheet: SheetData) -> bytes:
-    max_cols = max((len(row) for row in sheet.rows), default=0)
-    if max_cols == 0:
-        max_cols = 1
+_MAX_COLUMNS = 16384
+_COL_LETTERS = tuple(_column_letter(index) for index in range(1, _MAX_COLUMNS + 1))
+_COL_INDEX = {letters: index for index, letters in enumerate(_COL_LETTERS, start=1)}
+
+
+def column_index(letters: str) -> int | None:
+    """Return the 1-based index of upper-case column letters, or None if out of range."""
+    return _COL_INDEX.get(letters)
+
+
+_SHEET_FLUSH_ROWS = 4096
 
-    lines: List[str] = [
-        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
-        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">',
-        "  <sheetData>",
-    ]
 
-    for row_index, row in enumerate(sheet.rows, start=1):
-        has_values = any(
-            (cell.value or cell.formula)
-            for cell in row
+def _stream_sheet_xml(
+    writer: IO[bytes], sheet: SheetData, shared_strings: _SharedStringPool
+) -> None:
+    """Write the worksheet XML for sheet to writer, flushing every few thousand rows."""
+    spans = b"1:%d" % (len(sheet.columns) or 1)
+    columns = [
+        (
+            _COL_LETTERS[col_index].encode("ascii"),
+            column.values,
+            column.formulas,
+            column.types,
         )
-        if not has_values:
-            lines.append(f'    <row r="{row_index}" spans="1:{max_cols}"/>')
-            continue
+        for col_index, column in enumerate(sheet.columns)
+    ]
+
+    # Assemble bytes directly so no sheet-sized str is built and then encoded.
+    buf = bytearray(
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">\n'
+        b"  <sheetData>\n"
+    )
 
-        lines.append(f'    <row r="{row_index}" spans="1:{max_cols}">')
-        for col_index, cell in enumerate(row, start=1):
-            if not cell.value and not cell.formula:
+    for row_offset in range(sheet.row_count):
+        row_index = row_offset + 1
+        if row_index % _SHEET_FLUSH_ROWS == 0:
+            writer.write(buf)
+            buf.clear()
+
+        row_ref = b"%d" % row_index
+        row_start = len(buf)
+        buf += b'    <row r="%s" spans="%s">\n' % (row_ref, spans)
+        has_cells = False
+        for letter, values, formulas, types in columns:
+            value = values[row_offset]
+            formula = formulas[row_offset]
+            if not value and not formula:
                 continue
-            cell_ref = f"{_column_letter(col_index)}{row_index}"
-            if cell.formula:
-                attrs = [f'r="{cell_ref}"']
-                if cell.data_type:
-                    attrs.append(f't="{cell.data_type}"')
-                lines.append(f"      <c {' '.join(attrs)}>")
-                lines.append(f"        <f>{escape(cell.formula)}</f>")
-                if cell.value:
-                    lines.append(f"        <v>{escape(cell.value)}</v>")
-                lines.append("      </c>")
+            has_cells = True
+            if formula:
+                data_type = types[row_offset]
+                if data_type:
+                    buf += b'      <c r="%s%s" t="%s">\n' % (
+                        letter,
+                        row_ref,
+                        data_type.encode("ascii"),
+                    )
+                else:
+                    buf += b'      <c r="%s%s">\n' % (letter, row_ref)
+                buf += b"        <f>%s</f>\n" % formula.translate(_XML_ESCAPE).encode("utf-8")
+                # Boolean formulas are recalculated on load (see calcPr), so the
+                # cached result is left out.
+                if value and data_type != "b":
+                    buf += b"        <v>%s</v>\n" % value.translate(_XML_ESCAPE).encode("utf-8")
+                buf += b"      </c>\n"
             else:
-                value = cell.value
-                escaped = escape(value).replace("\n", "&#10;")
-                preserve = ' xml:space="preserve"' if value.strip() != value else ""
-                lines.append(
-                    f'      <c r="{cell_ref}" t="inlineStr"><is><t{preserve}>{escaped}</t></is></c>'
+                buf += b'      <c r="%s%s" t="s"><v>%d</v></c>\n' % (
+                    letter,
+                    row_ref,
+                    shared_strings.index(value),
                 )
-        lines.append("    </row>")
+        if has_cells:
+            buf += b"    </row>\n"
+        else:
+            del buf[row_start:]
+            buf += b'    <row r="%s" spans="%s"/>\n' % (row_ref, spans)
 
-    lines.append("  </sheetData>")
-    lines.append("</worksheet>")
-    return "\n".join(lines).encode("utf-8")
+    buf += b"  </sheetData>\n</worksheet>"
+    writer.write(buf)
+
+
+def _stream_shared_strings_xml(writer: IO[bytes], shared_strings: _SharedStringPool) -> None:
+    """Write xl/sharedStrings.xml for every string collected while writing the sheets."""
+    buf = bytearray(
+        (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            f'uniqueCount="{len(shared_strings.values)}">\n'
+        ).encode("utf-8")
+    )
+    for position, value in enumerate(shared_strings.values, start=1):
+        if position % _SHEET_FLUSH_ROWS == 0:
+            writer.write(buf)
+            buf.clear()
+        escaped = value.translate(_XML_ESCAPE)
+        preserve = ' xml:space="preserve"' if value.strip() != value else ""
+        buf += f"  <si><t{preserve}>{escaped}</t></si>\n".encode("utf-8")
+    buf += b"</sst>"
+    writer.write(buf)
 
 
 def _build_workbook_xml(sheet_names: Iterable[str]) -> bytes:
@@ -94,11 +231,12 @@ def _build_workbook_xml(sheet_names: Iterable[str]) -> bytes:
         "  <sheets>",
     ]
     for index, name in enumerate(sheet_names, start=1):
-        safe_name = escape(name)
+        safe_name = name.translate(_XML_ESCAPE)
         lines.append(
             f'    <sheet name="{safe_name}" sheetId="{index}" r:id="rId{index}"/>'
         )
     lines.append("  </sheets>")
+    lines.append('  <calcPr fullCalcOnLoad="1"/>')
     lines.append("</workbook>")
     return "\n".join(lines).encode("utf-8")
 
@@ -119,6 +257,9 @@ def _build_content_types_xml(sheet_count: int) -> bytes:
     lines.append(
         '  <Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
     )
+    lines.append(
+        '  <Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    )
     lines.append("</Types>")
     return "\n".join(lines).encode("utf-8")
 
@@ -150,6 +291,11 @@ def _build_workbook_rels_xml(sheet_count: int) -> bytes:
             sheet_count + 1
         )
     )
+    lines.append(
+        '  <Relationship Id="rId{0}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'.format(
+            sheet_count + 2
+        )
+    )
     lines.append("</Relationships>")
     return "\n".join(lines).encode("utf-8")
 
@@ -186,23 +332,45 @@ def _build_styles_xml() -> bytes:
     ).encode("utf-8")
 
 
-def write_xlsx(path: str | io.BufferedIOBase, sheets: Iterable[SheetData]) -> None:
+def write_xlsx(
+    path: str | io.BufferedIOBase,
+    sheets: Iterable[SheetData | RawSheetData],
+    shared_strings: Sequence[str] = (),
+    styles_xml: bytes | None = None,
+) -> None:
+    """Write sheets to path as an XLSX workbook.
+
+    shared_strings seeds the shared strings table so that RawSheetData copied from
+    another workbook keeps resolving its indices; styles_xml likewise replaces the
+    built-in stylesheet so the style indices of such sheets stay valid.
+    """
     sheets = list(sheets)
     if not sheets:
         raise ValueError("Workbook must contain at least one sheet")
 
-    sheet_xml_data = [_build_sheet_xml(sheet) for sheet in sheets]
     workbook_xml = _build_workbook_xml(sheet.name for sheet in sheets)
     content_types_xml = _build_content_types_xml(len(sheets))
     root_rels_xml = _build_root_rels_xml()
     workbook_rels_xml = _build_workbook_rels_xml(len(sheets))
-    styles_xml = _build_styles_xml()
+    if styles_xml is None:
+        styles_xml = _build_styles_xml()
 
-    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+    # XML compresses well even at the fastest level; writing is CPU-bound otherwise.
+    with zipfile.ZipFile(
+        path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1
+    ) as zf:
         zf.writestr("[Content_Types].xml", content_types_xml)
         zf.writestr("_rels/.rels", root_rels_xml)
         zf.writestr("xl/workbook.xml", workbook_xml)
         zf.writestr("xl/_rels/workbook.xml.rels", workbook_rels_xml)
         zf.writestr("xl/styles.xml", styles_xml)
-        for index, data in enumerate(sheet_xml_data, start=1):
-            zf.writestr(f"xl/worksheets/sheet{index}.xml", data)
+        string_pool = _SharedStringPool(shared_strings)
+        for index, sheet in enumerate(sheets, start=1):
+            part_name = f"xl/worksheets/sheet{index}.xml"
+            if isinstance(sheet, RawSheetData):
+                zf.writestr(part_name, sheet.xml_bytes)
+                continue
+            with zf.open(part_name, "w", force_zip64=True) as writer:
+                _stream_sheet_xml(writer, sheet, string_pool)
+        with zf.open("xl/sharedStrings.xml", "w", force_zip64=True) as writer:
+            _stream_shared_strings_xml(writer, string_pool)